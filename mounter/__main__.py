@@ -22,6 +22,7 @@ parser.add_argument('--disassembly', action="store_true", help="Use textual inte
 parser.add_argument('--debug', action="store_true", help="Compile debug information, wherever applicable.")
 parser.add_argument('--optimalize', action="store_true", help="Enable optimalizations.")
 parser.add_argument('--sequential', action="store_true", help="Use deterministic sequential execution.")
+parser.add_argument('--cache', action="store_true", help="Reuse compiled objects from obj/cache. The cache is never pruned.")
 
 w = Workspace()
 
@@ -63,6 +64,8 @@ if cpp.ClangModule in w:
 	cppManifest.rootDirectory = root
 	cppManifest.binDirectory = bin
 	cppManifest.objDirectory = obj.subpath("cpp")
+	if args.cache:
+		cppManifest.cacheDirectory = obj.subpath("cache")
 	cppManifest.assemble = args.disassembly
 	cppManifest.debug = args.debug
 	cppManifest.optimalize = args.optimalize
@@ -205,6 +205,15 @@ class FileDeltaChecker(Module):
 		ch = self.lookupCheckerByPath(path)
 		return ch.getVersion()
 	
+	def queryHash(self, path: PathLike):
+		"""
+		Returns the content hash of the path, or None if it is absent.
+		Unlike versions, hashes do not depend on the workspace they were computed in.
+		"""
+		path = self.__sanitizeQuery(path)
+		ch = self.lookupCheckerByPath(path)
+		return ch.getHash()
+	
 	async def test(self, version : int):
 		checker = self.__idmap.get(version,None)
 		return checker is not None and await checker.testVersion(version)
@@ -1,7 +1,12 @@
 
 from subprocess import list2cmdline
+import hashlib
+import mmap
+import os
 import re
-from typing import Coroutine, Set, List, FrozenSet, override, AsyncIterable, Awaitable
+import unicodedata
+import uuid
+from typing import Coroutine, Iterable, Sequence, Set, List, Tuple, FrozenSet, override, AsyncIterable, Awaitable
 from mounter.operation.files import *
 from mounter.path import *
 from mounter.workspace import *
@@ -10,7 +15,7 @@ from mounter.persistence import *
 from mounter.progress import *
 from mounter.goal import *
 from mounter.operation import *
-from mounter.operation.completion import Instant, Task
+from mounter.operation.completion import Instant
 
 CPP_STRING_LITERAL = re.compile((
 	r"(?P<kind>L|u8|u|U)?" # Literal kind
@@ -20,83 +25,163 @@ CPP_STRING_LITERAL = re.compile((
 	r"(?(raw)\)(?P=delim))\"" # Suffix
 ),flags = re.DOTALL)
 
+# Each escape form has its own group, so m.lastgroup names the form that matched.
 CPP_STRING_ESCAPE = re.compile((
-	rb"\\("
+	rb"\\(?:"
 	rb"(?P<control>[abfnrtv])"
-	rb"|(?P<o>o{)?(?P<octal>(?(o)[0-7]+|[0-7]{1,3}))(?(o)})"
-	rb"|x(?P<xopen>{)?(?P<hex>[0-9a-fA-F]+)(?(xopen)})"
-	rb"|(?:(?P<uopen>u{)|(?P<u>u)|(?P<U>U))"
-		rb"(?P<unicode>(?(uopen)[0-9a-fA-F]+)(?(u)[0-9a-fA-F]{4})(?(U)[0-9a-fA-F]{8}))"
-		rb"(?(uopen)})"
+	rb"|o{(?P<delimitedOctal>[0-7]+)}"
+	rb"|(?P<octal>[0-7]{1,3})"
+	rb"|x{(?P<delimitedHex>[0-9a-fA-F]+)}"
+	rb"|x(?P<hex>[0-9a-fA-F]+)"
+	rb"|u{(?P<delimitedUnicode>[0-9a-fA-F]+)}"
+	rb"|u(?P<unicode>[0-9a-fA-F]{4})"
+	rb"|U(?P<longUnicode>[0-9a-fA-F]{8})"
 	rb"|N{(?P<name>.+?)}"
 	rb"|(?P<char>.))"
 ),flags = re.DOTALL)
 
-CPP_LINE_MARKER = re.compile(fr"^#\s+(?P<line>\d+)\s+{CPP_STRING_LITERAL.pattern}", re.DOTALL | re.MULTILINE)
+# Preprocessed files are scanned as bytes. Only the literals are decoded.
+CPP_LINE_MARKER = re.compile(fr"^#\s+(?P<line>\d+)\s+{CPP_STRING_LITERAL.pattern}".encode(), re.DOTALL | re.MULTILINE)
+
+CPP_CONTROL_ESCAPES = {
+	b"a":b"\a",
+	b"b":b"\b",
+	b"f":b"\f",
+	b"n":b"\n",
+	b"r":b"\r",
+	b"t":b"\t",
+	b"v":b"\v"
+}
+
+# The base of each numeric escape form, and whether it denotes a code point
+# (encoded as UTF-8) rather than a single code unit.
+CPP_NUMERIC_ESCAPES = {
+	"octal":(8,False),
+	"delimitedOctal":(8,False),
+	"hex":(16,False),
+	"delimitedHex":(16,False),
+	"unicode":(16,True),
+	"delimitedUnicode":(16,True),
+	"longUnicode":(16,True)
+}
 
 def cppEscapeSubstitution(m : re.Match[bytes]):
 	# These DO come up in clang-generated preprocessed files...
-	control = m["control"]
-	octal = m["octal"]
-	hex = m["hex"]
-	unicode = m["unicode"]
-	name = m["name"]
-	char = m["char"]
-	if control:
-		return {
-			b"a":b"\a",
-			b"b":b"\b",
-			b"f":b"\f",
-			b"n":b"\n",
-			b"r":b"\r",
-			b"t":b"\t",
-			b"v":b"\v"
-			}[control]
-	if octal:
-		return bytes([int(octal,8)])
-	if hex:
-		return bytes([int(octal,16)])
-	if unicode:
-		return chr(int(hex,16)).encode()
-	if name:
-		return str(eval(f"\"\\N{{{name}}}\"")).encode()
-	if char:
-		return char
+	kind = m.lastgroup
+	value = m[kind]
+	if kind == "char":
+		return value
+	if kind == "control":
+		return CPP_CONTROL_ESCAPES[value]
+	numeric = CPP_NUMERIC_ESCAPES.get(kind,None)
+	if numeric is not None:
+		(base,isCodePoint) = numeric
+		code = int(value,base)
+		return chr(code).encode() if isCodePoint else bytes((code,))
+	if kind == "name":
+		return unicodedata.lookup(value.decode("ascii")).encode()
 	raise Exception(f"Unrecognised escape sequence: {m.group()}")
 
-def getLiteralContent(m : re.Match):
-	sequence : str = m["sequence"]
-	if m["raw"]:
-		return sequence
+def getLiteralContent(m : re.Match[bytes]) -> str:
+	sequence : bytes = m["sequence"]
+	if m["raw"] or b"\\" not in sequence:
+		# Most line markers contain no escapes at all.
+		return sequence.decode()
 	else:
 		try:
-			return CPP_STRING_ESCAPE.sub(cppEscapeSubstitution, sequence.encode()).decode()
+			return CPP_STRING_ESCAPE.sub(cppEscapeSubstitution, sequence).decode()
 		except Exception as exc:
 			raise Exception(f"Error parsing {m.group()}: {exc.args}")
 
 CPP_NOT_A_SOURCE = re.compile(r"<.*>")
 
+CPP_SOURCE_EXTENSIONS = frozenset(["cpp","c"])
+CPP_SOURCE_SUFFIXES = tuple(f".{e}" for e in CPP_SOURCE_EXTENSIONS)
+
+# Preprocessed files below this size are scanned directly on the event loop,
+# where a thread pool round trip would cost more than the scan itself.
+CPP_INLINE_SCAN_LIMIT = 1 << 16
+
+def findLineMarkers(data : bytes | mmap.mmap, endpos : int):
+	"""
+	Yields the line markers in the data up to endpos.
+	Only lines beginning with '#' are matched against CPP_LINE_MARKER.
+	"""
+	lineStart = 0
+	while True:
+		if data[lineStart:lineStart + 1] == b"#":
+			m = CPP_LINE_MARKER.match(data, lineStart, endpos)
+			if m is not None:
+				yield m
+		newline = data.find(b"\n#", lineStart, endpos)
+		if newline == -1:
+			return
+		lineStart = newline + 1
+
 def readIncludes(path : Path):
 	includePaths = set()
 	
-	with path.open("r",encoding = "utf-8") as input:
-		data = ""
-		lastMatch = 0
-		while True:
-			nd = input.read(0x100000)
-			if len(nd) == 0:
-				break
-
-			data = data[lastMatch:] + nd
-			lastMatch = 0
-			for lineMarkerMatch in CPP_LINE_MARKER.finditer(data):
-				lastMatch = lineMarkerMatch.start()
-				pathLiteral = getLiteralContent(lineMarkerMatch)
-				if not CPP_NOT_A_SOURCE.fullmatch(pathLiteral):
-					includePaths.add(Path(pathLiteral))
+	if path.getContentLength() == 0:
+		return frozenset()
+
+	# The file is mapped so that the regex can run over it in place.
+	with path.open("r") as input, \
+		mmap.mmap(input.fileno(), 0, access = mmap.ACCESS_READ) as data:
+		for lineMarkerMatch in findLineMarkers(data, len(data)):
+			pathLiteral = getLiteralContent(lineMarkerMatch)
+			if not CPP_NOT_A_SOURCE.fullmatch(pathLiteral):
+				includePaths.add(Path(pathLiteral))
 	
 	return frozenset(includePaths)
 
+def digestVersions(versions : Sequence) -> str:
+	"""
+	Condenses a sequence of file versions into a single digest,
+	so that it can be persisted and compared cheaply.
+	"""
+	return hashlib.blake2b(repr(versions).encode(), digest_size = 16).hexdigest()
+
+def outermostPaths(paths : Iterable[Path]) -> List[Path]:
+	"""
+	Returns the paths sorted, without the ones that are subpaths of another.
+	"""
+	roots : List[Path] = []
+	for p in sorted(paths, key = str):
+		if not any(r.isSubpath(p) for r in roots):
+			roots.append(p)
+	return roots
+
+def collectSources(directory : Path, excluded : FrozenSet[Path]) -> Set[Path]:
+	"""
+	Walks the directory for C and C++ sources.
+	The excluded directories are not entered, and a Path
+	is only made for the files that are actually sources.
+	This runs on a background thread.
+	"""
+	sources : Set[Path] = set()
+	stack = [str(directory)]
+	while len(stack) != 0:
+		with os.scandir(stack.pop()) as entries:
+			for e in entries:
+				if e.is_dir():
+					if e.name != ".git" and Path(e.path) not in excluded:
+						stack.append(e.path)
+				elif e.name.endswith(CPP_SOURCE_SUFFIXES):
+					sources.add(Path(e.path))
+	return sources
+
+def storeInCache(file : Path, cacheFile : Path):
+	"""
+	Copies the file into the cache through a temporary file,
+	so that a partially written entry is never visible.
+	This runs on a background thread.
+	"""
+	cacheFile.getAncestor().opCreateDirectories()
+	# Unique per call, as two groups may store the same entry at once.
+	tempFile = cacheFile.getAncestor().subpath(f"{cacheFile.getName()}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+	file.opCopyTo(tempFile)
+	tempFile.opReplace(cacheFile)
+
 class CppGroup():
 	def getIncludes(self) -> FrozenSet[Path]:
 		return Instant(frozenset())
@@ -184,31 +269,33 @@ class InputCppGroup(CppGroup):
 class AggregatorCppGroup(CppGroup):
 	def __init__(self, dependencies : Dict[CppGroup,bool] = ()) -> None:
 		self._dependencies : Dict[CppGroup,bool] = dict(dependencies)
+		self._publicDependencies : Tuple[CppGroup,...] = tuple(g for (g,p) in self._dependencies.items() if p)
+		self._allDependencies : Tuple[CppGroup,...] = tuple(self._dependencies.keys())
 
 	@op
 	async def __lookupIncludes(self,allowPrivate) -> FrozenSet[Path]:
-		tasks = [g.getIncludes() for (g,p) in self._dependencies.items() if (allowPrivate or p)]
-		return frozenset([i for t in tasks for i in await t])
+		tasks = [g.getIncludes() for g in (self._allDependencies if allowPrivate else self._publicDependencies)]
+		return frozenset().union(*await Gather(*tasks))
 
 	@op
 	async def __lookupObjects(self,allowPrivate) -> FrozenSet[Path]:
-		tasks = [g.getObjects() for (g,p) in self._dependencies.items() if (allowPrivate or p)]
-		return frozenset([o for t in tasks for o in await t])
+		tasks = [g.getObjects() for g in (self._allDependencies if allowPrivate else self._publicDependencies)]
+		return frozenset().union(*await Gather(*tasks))
 	
 	@op
 	async def __lookupStaticLibraries(self,allowPrivate) -> FrozenSet[Path]:
-		tasks = [g.getStaticLibraries() for (g,p) in self._dependencies.items() if (allowPrivate or p)]
-		return frozenset([l for t in tasks for l in await t])
+		tasks = [g.getStaticLibraries() for g in (self._allDependencies if allowPrivate else self._publicDependencies)]
+		return frozenset().union(*await Gather(*tasks))
 	
 	@op
 	async def __lookupDynamicLibraries(self,allowPrivate) -> FrozenSet[Path]:
-		tasks = [g.getDynamicLibraries() for (g,p) in self._dependencies.items() if (allowPrivate or p)]
-		return frozenset([l for t in tasks for l in await t])
+		tasks = [g.getDynamicLibraries() for g in (self._allDependencies if allowPrivate else self._publicDependencies)]
+		return frozenset().union(*await Gather(*tasks))
 	
 	@op
 	async def __lookupCompileFlags(self,allowPrivate) -> FrozenSet[str]:
-		tasks = [g.getCompileFlags() for (g,p) in self._dependencies.items() if (allowPrivate or p)]
-		return frozenset([l for t in tasks for l in await t])
+		tasks = [g.getCompileFlags() for g in (self._allDependencies if allowPrivate else self._publicDependencies)]
+		return frozenset().union(*await Gather(*tasks))
 	
 	def getIncludes(self): return self.__lookupIncludes(False)
 	def getObjects(self): return self.__lookupObjects(True)
@@ -220,9 +307,17 @@ class AggregatorCppGroup(CppGroup):
 	def _getMyDynamicLibraries(self): return self.__lookupDynamicLibraries(True)
 	def _getMyCompileFlags(self): return self.__lookupCompileFlags(True)
 
+	@op
+	async def _getSortedObjects(self) -> Tuple[Path,...]:
+		return tuple(sorted(await self.getObjects(), key = str))
+
+	@op
+	async def _getMySortedStaticLibraries(self) -> Tuple[Path,...]:
+		return tuple(sorted(await self._getMyStaticLibraries(), key = str))
+
 	@once
 	def onCompile(self, mainGroup: CppGroup):
-		return Gather(*[g.onCompile(mainGroup) for g in self._dependencies.keys()])
+		return Gather(*[g.onCompile(mainGroup) for g in self._allDependencies])
 
 class ClangCppGroup(AggregatorCppGroup):
 	def __init__(self,
@@ -231,6 +326,7 @@ class ClangCppGroup(AggregatorCppGroup):
 			srcDirectory : Path = ...,
 			binDirectory : Path = ...,
 			objDirectory : Path = ...,
+			cacheDirectory : Path | None = None,
 			rootDirectory : Path = ...,
 			assemble : bool = False,
 			debug : bool = False,
@@ -244,6 +340,7 @@ class ClangCppGroup(AggregatorCppGroup):
 		self.ws : Final[Workspace] = clangModule.ws
 		self.__rootDirectory = rootDirectory
 		self.__objDirectory = objDirectory
+		self.__cacheDirectory = cacheDirectory
 		self.__binDirectory = binDirectory
 		self.__srcDirectory = srcDirectory
 		self.__assemble = assemble
@@ -252,17 +349,49 @@ class ClangCppGroup(AggregatorCppGroup):
 		self.__sources = sources
 		self.__optimalize = optimalize
 		self.__outputName = outputName
+		self.__asyncOps = self.ws[AsyncOps]
+		self.__progress = self.ws[Progress]
+		self.__deltaChecker = self.ws[FileDeltaChecker]
+		self.__fileManagement = self.ws[FileManagement]
 	
 	@op
-	async def __getAdditionalArguments(self):
+	async def __getAdditionalArguments(self) -> List[str]:
+		"""
+		The compile flags passed on to clang, sorted. The list must not be modified.
+		"""
 		flags = await self._getMyCompileFlags()
-		args = set()
-		for f in flags:
-			if f.startswith("-std="):
-				args.add(f)
-			if f.startswith("-Wno"):
-				args.add(f)
-		return frozenset(args)
+		return sorted(f for f in flags if f.startswith(("-std=","-Wno")))
+	
+	@op
+	async def __getPreprocessArguments(self) -> Tuple[str,...]:
+		"""
+		The arguments shared by every preprocess command of the group, following the paths.
+		"""
+		includes,args = await Gather(self._getMyIncludes(),self.__getAdditionalArguments())
+		cmd = ["-finput-charset=UTF-8",*args]
+		cmd.extend(f"-I{i}" for i in sorted(includes, key = str))
+		return tuple(cmd)
+	
+	@op
+	async def __getCompileArguments(self) -> Tuple[str,...]:
+		"""
+		The arguments shared by every compile command of the group, following the paths.
+		"""
+		args = await self.__getAdditionalArguments()
+		cmd = ["-finput-charset=UTF-8",*args]
+		if self.__assemble:
+			cmd.append("--assemble")
+		else:
+			cmd.append("--compile")
+		if self.__useLLVM:
+			cmd.append("-emit-llvm")
+		if self.__debug:
+			cmd.append("--debug")
+		if self.__optimalize:
+			cmd.append("-O3")
+			if self.__useLLVM:
+				cmd.append("-flto")
+		return tuple(cmd)
 	
 	@op
 	async def getBinDirectory(self) -> Path:
@@ -270,14 +399,15 @@ class ClangCppGroup(AggregatorCppGroup):
 		return self.__binDirectory
 	
 	async def __runCommandHandleResult(self, commandSeq, progressUnit):
-		(rc, a, b) = await self.ws[AsyncOps].runCommand(commandSeq, progressUnit = progressUnit)
-		if b != b'' or rc != 0:
-			print(f"Error: {subprocess.list2cmdline(commandSeq)}")
-			print(b.decode(),end="")
+		(rc, a, b) = await self.__asyncOps.runCommand(commandSeq, progressUnit = progressUnit)
+		if rc == 0 and b == b'':
+			return a == b''
+		print(f"Error: {list2cmdline(commandSeq)}")
+		print(b.decode(),end="")
 		if rc != 0:
 			print(f"Process exited with code {rc}")
 			raise Exception("Clang command fail")
-		return a == b'' and b == b''
+		return False
 
 	@op
 	async def __preprocess(self, sourceFile : Path) -> Path:
@@ -285,50 +415,48 @@ class ClangCppGroup(AggregatorCppGroup):
 		Preprocess the specified source file.
 		Returns after the operation is done, with the Path of the preprocessed file.
 		"""
-		with self.ws[Progress].register() as pu:
+		with self.__progress.register() as pu:
 			outputFile = sourceFile \
 				.relativeTo(self.__rootDirectory) \
 				.moveTo(self.__srcDirectory) \
 				.withExtension("cpp")
-			includes,args,_ = await Gather(
+			includes,args,preprocessArgs,_ = await Gather(
 				self._getMyIncludes(),
 				self.__getAdditionalArguments(),
-				self.ws[AsyncOps].redLight()
+				self.__getPreprocessArguments(),
+				self.__asyncOps.redLight()
 			)
 
-			args = sorted(args)
-
-			deltaChecker = self.ws[FileDeltaChecker]
-
-			dependencyHash = []
-			dependencyHash.append(Task(deltaChecker.query(sourceFile)))
-
-			for i in sorted(includes):
-				dependencyHash.append(Task(deltaChecker.query(PathSet(f"{i}/**/"))))
-			
-			dependencyHash = [await d for d in dependencyHash]
+			deltaChecker = self.__deltaChecker
+
+			# A nested include directory is already covered by its ancestor's
+			# files, but it still changes the command. The arguments carry the
+			# full -I list, so they are part of the digest.
+			dependencyHash = digestVersions([
+				*await Gather(
+					deltaChecker.query(sourceFile),
+					*[deltaChecker.query(PathSet(f"{i}/**/")) for i in outermostPaths(includes)]
+				),
+				*preprocessArgs
+			])
 			
-			data = self.ws[FileManagement].lock(outputFile, self)
+			data = self.__fileManagement.lock(outputFile, self)
 			includeHash = data.get("includeHash",())
-			
-			cmd = ["clang++",sourceFile,"-CC","--preprocess","-o",outputFile]
-			cmd.append("-finput-charset=UTF-8")
-			cmd.extend(args)
-			for i in includes:
-				cmd.extend(["--include-directory",i])
-			
-			cmd = [str(c) for c in cmd]
 
-			pu.setName(list2cmdline(cmd))
-
-			if data.get("dependencyHash",None) != dependencyHash \
+			if data.get("dependencyDigest",None) != dependencyHash \
 			or data.get("args",None) != args \
 			or not data.get("stable",None) \
-			or not all([await k for k in [Task(deltaChecker.test(v)) for v in includeHash]]) \
+			or not all(await Gather(*[deltaChecker.test(v) for v in includeHash])) \
 			or not outputFile.isPresent():
-				data.clear()				
+				cmd = ["clang++",str(sourceFile),"-CC","--preprocess","-o",str(outputFile),*preprocessArgs]
+
+				pu.setName(lambda: list2cmdline(cmd))
+
+				includePaths = data.get("includePaths",None)
+				scannedDigest = data.get("scannedDigest",None)
+				data.clear()
 				data["args"] = args
-				data["dependencyHash"] = dependencyHash
+				data["dependencyDigest"] = dependencyHash
 				st = False
 				
 				async def finalizeData():
@@ -337,18 +465,28 @@ class ClangCppGroup(AggregatorCppGroup):
 					nonlocal includes
 					nonlocal data
 					nonlocal st
-					includeHash = []
-					ipset = await self.ws[AsyncOps].callInBackground(functools.partial(readIncludes, outputFile))
-					for path in ipset:
-						if any(i.isSubpath(path) for i in includes):
-							includeHash.append(Task(deltaChecker.query(path)))
-					data["includeHash"] = [await k for k in includeHash]
+					nonlocal includePaths
+					# The include list only has to be parsed again if the
+					# preprocessed output or the include directories changed.
+					newScannedDigest = digestVersions([
+						await deltaChecker.query(outputFile),
+						*sorted(str(i) for i in includes)])
+					if includePaths is None or newScannedDigest != scannedDigest:
+						if outputFile.getContentLength() < CPP_INLINE_SCAN_LIMIT:
+							ipset = readIncludes(outputFile)
+						else:
+							ipset = await self.__asyncOps.callInBackground(readIncludes, outputFile)
+						includePaths = sorted(str(path) for path in ipset if any(i.isSubpath(path) for i in includes))
+					data["includePaths"] = includePaths
+					data["scannedDigest"] = newScannedDigest
+					data["includeHash"] = list(await Gather(*[deltaChecker.query(Path(path)) for path in includePaths]))
 					data["stable"] = st
 
 				outputFile.getAncestor().opCreateDirectories()
 				st = await self.__runCommandHandleResult(cmd, pu)
-				self.ws[AsyncOps].completeLater(finalizeData())
+				self.__asyncOps.completeLater(finalizeData())
 			else:
+				pu.setName(str(sourceFile))
 				pu.setUpToDate()
 			return outputFile
 	
@@ -358,17 +496,16 @@ class ClangCppGroup(AggregatorCppGroup):
 		Compiles the specified source file. (This includes preprocessing)
 		Returns after the operation is done, with the Path of the object file.
 		"""
-		with self.ws[Progress].register() as pu:
-			preFile,args,_ = await Gather(
+		with self.__progress.register() as pu:
+			preFile,args,compileArgs,_ = await Gather(
 				self.__preprocess(sourceFile),
 				self.__getAdditionalArguments(),
-				self.ws[AsyncOps].redLight()
+				self.__getCompileArguments(),
+				self.__asyncOps.redLight()
 			)
-			
-			args = sorted(args)
 
 			extension = None
-			deltaChecker = self.ws[FileDeltaChecker]
+			deltaChecker = self.__deltaChecker
 			if self.__assemble:
 				if self.__useLLVM:
 					extension = "ll"
@@ -394,47 +531,55 @@ class ClangCppGroup(AggregatorCppGroup):
 				.moveTo(self.__objDirectory) \
 				.withExtension(extension)
 
-			dependencyHash = [await deltaChecker.query(preFile)]
+			dependencyHash = digestVersions([await deltaChecker.query(preFile)])
 
-			cmd = ["clang++",preFile,"-o",outputFile]
-			cmd.append("-finput-charset=UTF-8")
-			cmd.extend(args)
-			if self.__assemble:
-				cmd.append("--assemble")
-			else:
-				cmd.append("--compile")
-			if self.__useLLVM:
-				cmd.append("-emit-llvm")
-			if self.__debug:
-				cmd.append("--debug")
-			if self.__optimalize:
-				cmd.append("-O3")
-				if self.__useLLVM:
-					cmd.append("-flto")
-			
-			cmd = [str(c) for c in cmd]
-
-			pu.setName(list2cmdline(cmd))
-			data = self.ws[FileManagement].lock(outputFile, self)
+			data = self.__fileManagement.lock(outputFile, self)
 
 			if self.__debug and not data.get("debug",None) \
 			or data.get("args",None) != args \
 			or data.get("optimalize",False) != self.__optimalize \
 			or not data.get("stable",None) \
-			or data.get("dependencyHash",None) != dependencyHash \
+			or data.get("dependencyDigest",None) != dependencyHash \
 			or not outputFile.isPresent():
+				cmd = ["clang++",str(preFile),"-o",str(outputFile),*compileArgs]
+
+				pu.setName(lambda: list2cmdline(cmd))
+
+				# The object only depends on the compiler, the preprocessed content
+				# and the flags. The preprocessed content carries the source paths
+				# in its line markers, so entries are only found again within the
+				# same build root, such as after obj/cpp was wiped or a source was
+				# changed back. Debug info also records the working directory,
+				# so debug objects are not cached.
+				cacheFile = None
+				if self.__cacheDirectory is not None and not self.__debug:
+					cacheKey = digestVersions([
+						await deltaChecker.queryHash(preFile),
+						await self.cpp.getCompilerIdentity(),
+						*compileArgs])
+					cacheFile = self.__cacheDirectory.subpath(f"{cacheKey}.{extension}")
+
 				data.clear()
 				outputFile.getAncestor().opCreateDirectories()
 				stable = False
 				try:
-					stable = await self.__runCommandHandleResult(cmd, pu)
+					if cacheFile is not None and cacheFile.isFile():
+						pu.setName(f"Copy {cacheFile} to {outputFile}")
+						pu.setRunning()
+						await self.__asyncOps.callInBackground(cacheFile.opCopyTo, outputFile)
+						stable = True
+					else:
+						stable = await self.__runCommandHandleResult(cmd, pu)
+						if stable and cacheFile is not None:
+							await self.__asyncOps.callInBackground(storeInCache, outputFile, cacheFile)
 				finally:
 					data["debug"] = self.__debug
 					data["optimalize"] = self.__optimalize
 					data["args"] = args
 					data["stable"] = stable
-					data["dependencyHash"] = dependencyHash
+					data["dependencyDigest"] = dependencyHash
 			else:
+				pu.setName(str(preFile))
 				pu.setUpToDate()
 			return outputFile
 	
@@ -456,59 +601,51 @@ class ClangCppGroup(AggregatorCppGroup):
 		Links the specific output file in this group.
 		Returns it's path.
 		"""
-		with self.ws[Progress].register() as pu:
-			deltaChecker = self.ws[FileDeltaChecker]
+		with self.__progress.register() as pu:
+			deltaChecker = self.__deltaChecker
 
 			(binDirectory,staticLibraries,allObjects,args,_) = await Gather(
 				self.getBinDirectory(),
-				self._getMyStaticLibraries(),
-				self.getObjects(),
+				self._getMySortedStaticLibraries(),
+				self._getSortedObjects(),
 				self.__getAdditionalArguments(),
-				self.ws[AsyncOps].redLight()
+				self.__asyncOps.redLight()
 			)
-			
-			args = sorted(args)
 
 			outputFile = binDirectory.subpath(self.__outputName)
 			isMain = outputFile.hasExtension("exe")
-			dependencyHash = []
-			for o in sorted(allObjects):
-				dependencyHash.append(Task(deltaChecker.query(o)))
-			dependencyHash.append(Instant(None))
-			for l in sorted(staticLibraries):
-				dependencyHash.append(Task(deltaChecker.query(l)))
-			
-			dependencyHash = [await k for k in dependencyHash]
-				
-			cmd = ["clang++","-o",outputFile] + list(allObjects)
-			cmd.append("-finput-charset=UTF-8")
-			cmd.extend(args)
-			if self.__debug:
-				cmd.append("--debug")
-			if self.__optimalize:
-				cmd.append("-O3")
-				if self.__useLLVM:
-					cmd.append("-flto")
-			if self.__useLLVM:
-				cmd.append("-fuse-ld=lld")
-			if not isMain:
-				cmd.append("-shared")
-			for lib in staticLibraries:
-				cmd.append("--for-linker")
-				cmd.append(lib)
-			
-			cmd = [str(c) for c in cmd]
+			dependencyHash = digestVersions(await Gather(
+				Gather(*[deltaChecker.query(o) for o in allObjects]),
+				Gather(*[deltaChecker.query(l) for l in staticLibraries])
+			))
 
-			pu.setName(list2cmdline(cmd))
-			data = self.ws[FileManagement].lock(outputFile, self)
+			data = self.__fileManagement.lock(outputFile, self)
 			
 			if data.get("debug",False) != self.__debug \
 			or data.get("args",None) != args \
 			or data.get("optimalize",False) != self.__optimalize \
 			or not data.get("stable",False) \
-			or data.get("dependencyHash",None) != dependencyHash \
+			or data.get("dependencyDigest",None) != dependencyHash \
 			or not outputFile.isPresent():
-				
+				data.clear()
+				cmd = ["clang++","-o",str(outputFile),"-finput-charset=UTF-8",*args]
+				cmd.extend(str(o) for o in allObjects)
+				if self.__debug:
+					cmd.append("--debug")
+				if self.__optimalize:
+					cmd.append("-O3")
+					if self.__useLLVM:
+						cmd.append("-flto")
+				if self.__useLLVM:
+					cmd.append("-fuse-ld=lld")
+				if not isMain:
+					cmd.append("-shared")
+				for lib in staticLibraries:
+					cmd.append("--for-linker")
+					cmd.append(str(lib))
+
+				pu.setName(lambda: list2cmdline(cmd))
+
 				outputFile.getAncestor().opCreateDirectories()
 				stable = False
 				try:
@@ -518,8 +655,9 @@ class ClangCppGroup(AggregatorCppGroup):
 					data["optimalize"] = self.__optimalize
 					data["args"] = args
 					data["stable"] = stable
-					data["dependencyHash"] = dependencyHash
+					data["dependencyDigest"] = dependencyHash
 			else:
+				pu.setName(str(outputFile))
 				pu.setUpToDate()
 			
 			return outputFile
@@ -527,8 +665,8 @@ class ClangCppGroup(AggregatorCppGroup):
 	@op
 	async def copyDlls(self):
 		(dllSet,binDirectory) = await Gather(self._getMyDynamicLibraries(),self.getBinDirectory())
-		tasks = [self.ws[FileManagement].copyFile(l,l.relativeToAncestor().moveTo(binDirectory)) for l in dllSet]
-		await self.ws[AsyncOps].redLight()
+		tasks = [self.__fileManagement.linkFile(l,l.relativeToAncestor().moveTo(binDirectory)) for l in dllSet]
+		await self.__asyncOps.redLight()
 		await Gather(*tasks)
 	
 	@once
@@ -544,6 +682,9 @@ class CppModule(Module):
 		self.ws.add(AsyncOps)
 		self.rootDirectory = Path(".")
 		self.objDirectory = self.rootDirectory.subpath("obj/cpp")
+		# The object cache is off unless a directory is set. Its entries are
+		# never removed, so it only grows, and can be deleted at any time.
+		self.cacheDirectory : Path | None = None
 		self.binDirectory = self.rootDirectory.subpath("bin")
 		self.srcDirectory = self.objDirectory
 	
@@ -565,6 +706,18 @@ class ClangModule(CppModule):
 		self.debug = False
 		self.optimalize = False
 	
+	@op
+	async def getCompilerIdentity(self) -> str:
+		"""
+		The version output of clang++, run once.
+		Cached objects from a different compiler must not be reused.
+		"""
+		(rc, a, b) = await self.ws[AsyncOps].runCommand(["clang++","--version"])
+		if rc != 0:
+			print(b.decode(),end="")
+			raise Exception("Clang command fail")
+		return a.decode()
+	
 	def makeGroup(self,**kwargs):
 		def setDefault(key,value):
 			nonlocal kwargs
@@ -572,6 +725,7 @@ class ClangModule(CppModule):
 				kwargs[key] = value
 		setDefault("rootDirectory",self.rootDirectory)
 		setDefault("objDirectory",self.objDirectory)
+		setDefault("cacheDirectory",self.cacheDirectory)
 		setDefault("binDirectory",self.binDirectory)
 		setDefault("srcDirectory",self.srcDirectory)
 		setDefault("assemble",self.assemble)
@@ -604,15 +758,25 @@ class CppProject(Module,SupportsCppGroup):
 	def fillGroup(self):
 		if self._dir is not None:
 			self.group.includes.add(self._dir)
-			for p in self._dir.getPreorder():
-				if p not in self.__mainPaths and p.hasExtension("cpp","c"):
-					self.compilationUnits.add(p)
+	
+	@op
+	async def __collectCompilationUnits(self):
+		"""
+		Adds the sources found in the project directory to the compilation units.
+		The walk runs on a background thread, and only gets what it is given.
+		"""
+		if self._dir is not None:
+			cpp = self.ws[CppModule]
+			excluded = frozenset(d for d in (cpp.objDirectory, cpp.srcDirectory, cpp.cacheDirectory, cpp.binDirectory) if d is not None)
+			sources = await self.ws[AsyncOps].callInBackground(collectSources, self._dir, excluded)
+			self.compilationUnits.update(sources - self.__mainPaths)
 	
 	async def onCompile(self,mainGroup : CppGroup):
 		pass
 	
 	@op
 	async def getCppGroup(self):
+		await self.__collectCompilationUnits()
 		dependencies = {
 			self.group : True,
 			self.privateGroup : False
@@ -642,6 +806,7 @@ class CppProject(Module,SupportsCppGroup):
 				p = self._dir.subpath(p)
 			self.__mainPaths.add(p)
 		self.fillGroup()
+		self.ws[AsyncOps].completeLater(self.__collectCompilationUnits())
 		for p in self.__mainPaths:
 			name = p.withExtension("exe").getName()
 			if self.ws[GoalTracker].defineThenQuery(name):
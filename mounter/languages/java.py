@@ -4,7 +4,6 @@ from typing import List, Dict, Set
 import mounter.workspace as workspace
 import struct
 import shutil
-import zipfile
 import itertools
 from mounter.operation import Operation, Command, CreateDirectories, Module as OperationModule, Sequence
 from mounter.languages.cpp import CppModule, CppProject, CppGroup, SupportsCppGroup
@@ -14,6 +13,22 @@ from mounter.workspace import Workspace
 def manifest():
 	return Module()
 
+class WriteArgumentFile(Operation):
+	"""
+	Writes the arguments to a javac @argfile, one quoted argument per line.
+	The file is written when the operation is run, not while planning.
+	"""
+	def __init__(self, path : Path, arguments) -> None:
+		super().__init__()
+		self.path = path
+		self.arguments = list(arguments)
+	
+	def run(self):
+		self.path.getAncestor().opCreateDirectories()
+		with self.path.open("w",encoding = "utf-8") as output:
+			for a in self.arguments:
+				output.write('"' + str(a).replace("\\","\\\\").replace('"','\\"') + '"\n')
+
 class JavaGroup:
 	def __init__(self) -> None:
 		# Arguments to pass to --module-path (Modules or directories containing modules)
@@ -41,7 +56,7 @@ class JavaGroup:
 	
 	def addSourceFiles(self,p: Path):
 		for f in p.getLeaves():
-			if f.hasExtension("java"):
+			if f.getExtension() == "java":
 				self.sourceFiles.add(f)
 	
 	def addSourceFile(self,p: Path):
@@ -55,6 +70,7 @@ class JavaGroup:
 			assert len(extensions) == 0, "Extensions may not be specified when adding a single file."
 			self.resourceFiles.add(p)
 		else:
+			extensions = frozenset(extensions)
 			for f in p.getLeaves():
 				if f.getExtension() in extensions:
 					self.resourceFiles.add(f)
@@ -135,8 +151,10 @@ class Module(workspace.Module):
 
 		requiredStates = set(group.sourceFiles)
 		
-		for (a,b) in itertools.combinations(group.sourcePaths,2):
-			assert (not a.isSubpath(b)) and (not b.isSubpath(a)),"Overlapping source paths not allowed!"
+		# Sorted by path elements, every path is directly followed by its subpaths if it has any,
+		# so checking neighbours is enough.
+		for (a,b) in itertools.pairwise(sorted(group.sourcePaths, key = lambda p: str(p).split("/"))):
+			assert not a.isSubpath(b),"Overlapping source paths not allowed!"
 
 		for md in sorted(group.modulePaths):
 			commandBase.extend(["--module-path",md])
@@ -152,45 +170,51 @@ class Module(workspace.Module):
 
 		twoPass = len(group.processors) > 0
 
+		# The source list goes through an argument file, so that large projects
+		# do not run into command line length limits. It is written right
+		# before the javac command that reads it.
+		sourceListPath = self._obj.subpath("srclist.txt")
+		writeSourceList = WriteArgumentFile(sourceListPath, sorted(group.sourceFiles))
+		sourceList = "@" + str(sourceListPath)
+
 		opSequence = list()
 
 		opSequence.append(CreateDirectories(generatedClassPath,generatedSourcePath,self._include,empty = True))
 
 		if twoPass:
-			firstPass = list(commandBase)
-			secondPass = list(commandBase)
-
-			firstPass.append("-proc:none")
-			
-			secondPass.extend(["-h",self._include])
-			secondPass.extend(["-s",generatedSourcePath])
-
 			firstPassPaths = set()
-			for (f,c) in sorted(group.processors):
+			processorNames = set()
+			for (f,c) in group.processors:
 				if f is not None:
 					firstPassPaths.add(f)
 					requiredStates.add(f)
 				if c is not None:
-					secondPass.extend(["-processor",c])
+					processorNames.add(c)
+
+			# Processors only given by class name are already compiled,
+			# so there is nothing to build before the main pass.
+			if len(firstPassPaths) != 0:
+				opSequence.append(Command(*commandBase,"-proc:none",*sorted(firstPassPaths)))
 			
-			secondPass.extend(sorted(group.sourceFiles))
-			firstPass.extend(sorted(firstPassPaths))
+			secondPass = [*commandBase,"-h",self._include,"-s",generatedSourcePath]
 
-			opSequence.append(Command(*firstPass))
+			# javac takes a single comma separated -processor list.
+			if len(processorNames) != 0:
+				secondPass.extend(["-processor",",".join(sorted(processorNames))])
+			
+			secondPass.append(sourceList)
+			opSequence.append(writeSourceList)
 			opSequence.append(Command(*secondPass))
 		else:
-			secondPass = list(commandBase)
-			secondPass.append("-proc:none")
-			secondPass.extend(["-h",self._include])
-			secondPass.extend(sorted(group.sourceFiles))
-			opSequence.append(Command(*secondPass))
+			opSequence.append(writeSourceList)
+			opSequence.append(Command(*commandBase,"-proc:none","-h",self._include,sourceList))
 
 		resourceOps = []
 
 		for re in sorted(group.resourceFiles):
 			rt = None
 			for sp in group.sourcePaths:
-				if re.isSubpath(sp):
+				if sp.isSubpath(re):
 					rt = re.relativeTo(sp)
 					break
 			
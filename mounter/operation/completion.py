@@ -1,7 +1,9 @@
 
 from typing import *
 import asyncio
+import collections
 import functools
+import threading
 
 A = TypeVar('A')
 B = TypeVar('B')
@@ -13,22 +15,29 @@ def absorbException(exc : BaseException):
 	"""
 	If the argument reports SystemExit or KeyboardInterrupt, the corresponding exception is raised.
 	"""
-	if isinstance(exc,BaseExceptionGroup):
-		for x in exc.exceptions:
-			absorbException(x)
-	if isinstance(exc, SystemExit | KeyboardInterrupt):
-		raise exc
+	# Groups nest as failures propagate, so they are walked with a stack
+	# instead of recursion. Children are visited in order.
+	stack = [exc]
+	while len(stack) != 0:
+		x = stack.pop()
+		if isinstance(x,BaseExceptionGroup):
+			stack.extend(reversed(x.exceptions))
+		elif isinstance(x, _INTERRUPT_TYPES):
+			raise x
 
 def isInterrupt(exc : BaseException):
 	"""
 	Tests whether the exception is being caused by an event that occurred
 	out of scope.
 	"""
-	if isinstance(exc,BaseExceptionGroup):
-		for x in exc.exceptions:
-			if not isInterrupt(x):
-				return False
-	return not isinstance(exc, SystemExit | KeyboardInterrupt | CancelledException)
+	stack = [exc]
+	while len(stack) != 0:
+		x = stack.pop()
+		if isinstance(x,BaseExceptionGroup):
+			stack.extend(x.exceptions)
+		elif isinstance(x, _OUT_OF_SCOPE_TYPES):
+			return False
+	return True
 
 class BaseCompletionException(Exception):
 	pass
@@ -36,62 +45,69 @@ class BaseCompletionException(Exception):
 class CancelledException(BaseCompletionException):
 	pass
 
+# Tuples, as isinstance checks these faster than the equivalent unions.
+_INTERRUPT_TYPES = (SystemExit, KeyboardInterrupt)
+_OUT_OF_SCOPE_TYPES = (SystemExit, KeyboardInterrupt, CancelledException)
+
 class Future(Generic[A]):
 	"""
 	A placeholder for the outcome of an asynchronous operation.
 	Waiting for the outcome is not always supported.
 	"""
-	__result : Tuple[bool,A | BaseException] | None
+	# The slots themselves are declared by CompletionFuture, as two bases
+	# with non-empty __slots__ cannot be combined.
+	__slots__ = ()
+	# The result is __unset until the future is done. It stays None if
+	# the future completes with an exception.
+	__result : A | object
+	__exception : BaseException | None
+	__unset : object = object()
 	def __new__(cls) -> Self:
 		self = super().__new__(cls)
-		self.__result = None
+		self.__result = Future.__unset
+		self.__exception = None
 		return self
 	
 	def _setResult(self,resultValue):
-		self.__result = (False,resultValue)
+		self.__result = resultValue
 	
 	def _setException(self,exceptionValue):
-		self.__result = (True,exceptionValue)
+		self.__exception = exceptionValue
+		self.__result = None
 	
 	def _copyFrom(self, source : 'Future[A]'):
 		assert source.done()
+		self.__exception = source.__exception
 		self.__result = source.__result
 
 	def done(self):
 		"""
 		Returns True if this future has the result ready. False otherwise.
 		"""
-		return self.__result is not None
+		return self.__result is not Future.__unset
 		
 	def result(self) -> A:
 		"""
 		Returns the result of the Future, or raises the exception.
 		"""
-		(doRaise,what) = self.__result
-		if doRaise:
-			raise what
-		else:
-			return what
+		if self.__exception is not None:
+			raise self.__exception
+		return self.__result
 	
 	def exception(self):
 		"""
 		Returns the exception of the Future, or None if completed normally.
 		"""
-		(doRaise,what) = self.__result
-		if doRaise:
-			return what
-		else:
-			return None
+		return self.__exception
 	
 	def copyToAsyncioFuture(self, future : asyncio.Future):
 		"""
 		Assigns the result of this Future to the specified asyncio future.
 		"""
-		(doRaise,what) = self.__result
-		if doRaise:
-			future.set_exception(what)
+		if self.__exception is not None:
+			future.set_exception(self.__exception)
 		else:
-			future.set_result(what)
+			future.set_result(self.__result)
 
 class Delayer():
 	"""
@@ -101,6 +117,7 @@ class Delayer():
 
 	This is the base class of awaitables in this module.
 	"""
+	__slots__ = ()
 	def then(self,proc : Callable[[Self], None]):
 		"""
 		Invokes the procedure at some unspecified time in the future.
@@ -136,11 +153,12 @@ class LoopDelayer(Delayer):
 	The 'then' method returns immediately when recursively invoked.
 	Otherwise it processes tasks until the queue is empty.
 	"""
-	__queue : List[Callable[[Self],None]]
+	__slots__ = ("__queue","__loopRunning")
+	__queue : Deque[Callable[[Self],None]]
 	__loopRunning : bool
 	def __new__(cls) -> Self:
 		self = super().__new__(cls)
-		self.__queue = []
+		self.__queue = collections.deque()
 		self.__loopRunning = False
 		return self
 	
@@ -151,27 +169,32 @@ class LoopDelayer(Delayer):
 			return
 		
 		self.__loopRunning = True
+		# Failures are rare, so the list is only made for the first one.
+		exceptions = None
+		queue = self.__queue
 		try:
-			exceptions = []
-			while len(self.__queue) != 0:
-				proc = self.__queue.pop()
+			while queue:
+				proc = queue.popleft()
 				try:
 					proc(self)
 				except BaseException as exc:
+					if exceptions is None:
+						exceptions = []
 					exceptions.append(exc)
 		finally:
 			self.__loopRunning = False
 		
-		if len(exceptions) != 0:
+		if exceptions is not None:
 			for e in exceptions:
 				absorbException(e)
-			raise ExceptionGroup("",exceptions = exceptions)
+			raise ExceptionGroup("",exceptions)
 
 class QueueDelayer(Delayer):
-	__queue : List[Callable[[Self],None]]
+	__slots__ = ("__queue",)
+	__queue : Deque[Callable[[Self],None]]
 	def __new__(cls) -> Self:
 		self = super().__new__(cls)
-		self.__queue = []
+		self.__queue = collections.deque()
 		return self
 	
 	def then(self, proc: Callable[..., Any]):
@@ -183,12 +206,13 @@ class QueueDelayer(Delayer):
 	def run(self, count : int | None = None):
 		tasksRun = 0
 		while tasksRun != count and len(self.__queue) != 0:
-			proc = self.__queue.pop(0)
+			proc = self.__queue.popleft()
 			proc(self)
 			tasksRun += 1
 		return tasksRun
 
 class DelegatedDelayer(Delayer):
+	__slots__ = ("__delegate",)
 	__delegate : Callable[[Callable], None]
 	def __new__(cls, delegate : Callable[[Callable], None]) -> Self:
 		self = super().__new__(cls)
@@ -204,44 +228,60 @@ class Completion(Delayer):
 	If the event has already occurred, further callbacks are run immediately on submission.
 	This is Awaitable.
 	"""
-	__queue : List[Callable] | Tuple
+	__slots__ = ("__queue",)
+	# The queue is None once completed. Most completions only ever get one
+	# callback, so that is stored as is, and a list is only made for more.
+	__queue : List[Callable] | Callable | Tuple | None
+	__empty : Tuple = ()
 	def __new__(cls) -> Self:
 		self = super().__new__(cls)
-		self.__queue = []
+		self.__queue = Completion.__empty
 		return self
 	
 	def _complete(self):
-		exceptions = []
 		queue = self.__queue
 		self.__queue = None
+		if queue is Completion.__empty:
+			return
+		if type(queue) is not list:
+			queue = (queue,)
+		exceptions = None
 		for a in queue:
 			try:
 				a(self)
 			except BaseException as exc:
+				if exceptions is None:
+					exceptions = []
 				exceptions.append(exc)
-		if len(exceptions) != 0:
+		if exceptions is not None:
 			for k in exceptions:
 				absorbException(k)
-			raise ExceptionGroup("",exceptions = exceptions)
+			raise ExceptionGroup("",exceptions)
 	
 	def done(self):
 		return self.__queue is None
 	
 	@override
 	def then(self,proc : Callable):
-		if self.__queue != None:
-			self.__queue.append(proc)
-		else:
+		queue = self.__queue
+		if queue is None:
 			proc(self)
+		elif queue is Completion.__empty:
+			self.__queue = proc
+		elif type(queue) is list:
+			queue.append(proc)
+		else:
+			self.__queue = [queue,proc]
 	
 	def __await__(self):
-		if self.__queue != None:
+		if self.__queue is not None:
 			yield self
 
 class Completed(Completion):
 	"""
 	A Completion that is completed with None as it's value.
 	"""
+	__slots__ = ()
 	__instance : 'Completed | None' = None
 	def __new__(cls) -> Self:
 		if cls is not Completed:
@@ -257,6 +297,7 @@ class CompletionFuture(Future[A],Completion):
 	"""
 	Combination of Future and Completion. Awaiting additionally returns the result, or raises the exception.
 	"""
+	__slots__ = ("_Future__result","_Future__exception")
 	@override
 	def _setResult(self, resultValue):
 		super()._setResult(resultValue)
@@ -300,10 +341,11 @@ class CompletionFuture(Future[A],Completion):
 		if loop is None:
 			loop = asyncio.get_event_loop()
 		future = loop.create_future()
-		self.thenCall(functools.partial(self.copyToAsyncioFuture,future))
+		self.thenCall(self.copyToAsyncioFuture,future)
 		return future
 
 class CompletableFuture(CompletionFuture):
+	__slots__ = ()
 	def __new__(cls) -> Self:
 		return super().__new__(cls)
 	
@@ -323,12 +365,20 @@ class CompletableFuture(CompletionFuture):
 			self.setResult(result)
 
 class Instant(CompletionFuture):
+	__slots__ = ()
+	__none : 'Instant | None' = None
 	def __new__(cls, result = None, exception = None) -> Self:
+		# A completed future never changes, so the common empty one is shared.
+		shared = result is None and exception is None and cls is Instant
+		if shared and Instant.__none is not None:
+			return Instant.__none
 		self = super().__new__(cls)
 		if exception is not None:
 			self._setException(exception)
 		else:
 			self._setResult(result)
+		if shared:
+			Instant.__none = self
 		return self
 
 async def _wrapAwaitable(awaitable : Awaitable[A]) -> A:
@@ -338,19 +388,27 @@ class Task(CompletionFuture[A]):
 	"""
 	Performs an await operation and returns the result.
 	"""
-
+	__slots__ = ("__coro",)
 	__coro : Coroutine[Delayer,None,A]
 	def __new__(cls, coro : Awaitable[A]) -> CompletionFuture:
 		if isinstance(coro,CompletionFuture):
 			return coro
+		if isinstance(coro,Delayer):
+			# Awaiting a plain Delayer waits for one callback and yields None,
+			# so there is no need to drive a coroutine for it.
+			self = super().__new__(cls)
+			coro.then(self.__delayerDone)
+			return self
 		if not isinstance(coro,Coroutine):
-			# Generic Delayer is also wrapped.
 			coro = _wrapAwaitable(coro)
 		self = super().__new__(cls)
 		self.__coro = coro
 		self._advance(None)
 		return self
 	
+	def __delayerDone(self,_):
+		self._setResult(None)
+	
 	def _advance(self,_):
 		try:
 			result = self.__coro.send(None)
@@ -402,23 +460,60 @@ class AsyncDelayer(Delayer):
 	"""
 	A delayer which registers the callbacks to a specified asyncio event loop.
 	Waiting on this blocks until the next pass of the event loop.
+
+	Callbacks submitted before the loop gets to them are run together,
+	so the loop is only woken up once per batch.
 	"""
+	__slots__ = ("__loop","__pending","__lock")
 	__loop : asyncio.AbstractEventLoop
+	__pending : List[Callable[[Self],None]]
+	__lock : threading.Lock
 	def __new__(cls, loop : asyncio.AbstractEventLoop | None = None) -> Self:
 		self = super().__new__(cls)
 		if loop is None:
 			loop = asyncio.get_event_loop()
 		self.__loop = loop
+		self.__pending = []
+		self.__lock = threading.Lock()
 		return self
 	
 	def then(self,proc : Callable):
-		self.__loop.call_soon_threadsafe(proc, self)
+		with self.__lock:
+			self.__pending.append(proc)
+			if len(self.__pending) != 1:
+				return
+		try:
+			onLoop = asyncio.get_running_loop() is self.__loop
+		except RuntimeError:
+			# No loop is running on this thread, as on the pooled threads.
+			onLoop = False
+		if onLoop:
+			# Already on the loop's thread, no need to wake it up.
+			self.__loop.call_soon(self.__runPending)
+		else:
+			self.__loop.call_soon_threadsafe(self.__runPending)
+	
+	def __runPending(self):
+		with self.__lock:
+			pending = self.__pending
+			self.__pending = []
+		exceptions = []
+		for proc in pending:
+			try:
+				proc(self)
+			except BaseException as exc:
+				exceptions.append(exc)
+		if len(exceptions) != 0:
+			for e in exceptions:
+				absorbException(e)
+			raise ExceptionGroup("",exceptions)
 
 class AsyncCompletion(Completion):
 	"""
 	A Completion that is immediately scheduled to be completed in the specified async event loop.
 	This provides the same scheduling as AsyncTask, except without a result.
 	"""
+	__slots__ = ()
 	def __new__(cls, loop : asyncio.AbstractEventLoop | None = None) -> Self:
 		self = super().__new__(cls)
 		if loop is None:
@@ -431,23 +526,36 @@ class AsyncTask(CompletionFuture[A]):
 	Wraps an asyncio awaitable in a CompletionFuture. If it is not a future,
 	it is scheduled for execution.
 	"""
+	__slots__ = ()
 	def __new__(cls, asyncCoro : Awaitable[A], loop : asyncio.AbstractEventLoop | None = None) -> Self:
 		self = super().__new__(cls)
-		future = asyncio.ensure_future(asyncCoro, loop = loop)
-		future.add_done_callback(self.__completeFromFuture)
+		if asyncio.iscoroutine(asyncCoro):
+			# The usual case. ensure_future would end up here anyway.
+			if loop is None:
+				loop = asyncio.get_event_loop()
+			future = loop.create_task(asyncCoro)
+		else:
+			future = asyncio.ensure_future(asyncCoro, loop = loop)
+		if future.done():
+			# A done callback would only be run on the next pass of the loop.
+			self.__completeFromFuture(future)
+		else:
+			future.add_done_callback(self.__completeFromFuture)
 		return self
 	
 	def __completeFromFuture(self, future : asyncio.Future[A]):
-		if future.cancelled():
+		# A single result() call covers the common successful case.
+		try:
+			result = future.result()
+		except asyncio.CancelledError:
 			self._setException(CancelledException())
+		except BaseException as exc:
+			self._setException(exc)
 		else:
-			exc = future.exception()
-			if exc is None:
-				self._setResult(future.result())
-			else:
-				self._setException(exc)
+			self._setResult(result)
 
 class Gather(Generic[*T],CompletionFuture[Tuple[*T]]):
+	__slots__ = ("__completions","__failFast","__remaining")
 	__completions : List[CompletionFuture]
 	__failFast : bool
 	@overload
@@ -492,9 +600,14 @@ class Gather(Generic[*T],CompletionFuture[Tuple[*T]]):
 			absorbException(exception)
 			self._setException(exception)
 		else:
-			self.__remaining = len(self.__completions)
-			for c in self.__completions:
-				c.then(self.__advance)
+			# Children that are already done need no callback.
+			pending = [c for c in self.__completions if not c.done()]
+			self.__remaining = len(pending)
+			if len(pending) == 0:
+				self.__collectResults()
+			else:
+				for c in pending:
+					c.then(self.__advance)
 		
 		return self
 	
@@ -502,30 +615,40 @@ class Gather(Generic[*T],CompletionFuture[Tuple[*T]]):
 		if self.__remaining == 0:
 			return
 
-		if self.__failFast and completion.exception() is not None:
-			self.__remaining = 0
-			self._setException(completion.exception())
-			return
+		if self.__failFast:
+			exception = completion.exception()
+			if exception is not None:
+				self.__remaining = 0
+				self._setException(exception)
+				return
 				
 		self.__remaining -= 1
 
 		if self.__remaining == 0:
+			self.__collectResults()
+	
+	def __collectResults(self):
+		if self.__failFast:
+			# Any failure would have completed the Gather already.
+			self._setResult(tuple([c.result() for c in self.__completions]))
+			return
 
-			exceptionList = []
-			resultList = []
-			
-			for c in self.__completions:
-				if c.exception() is not None:
-					exceptionList.append(c.exception())
-				else:
-					resultList.append(c.result())
-			
-			if len(exceptionList) == 1:
-				self._setException(exceptionList[0])
-			elif len(exceptionList) != 0:
-				self._setException(ExceptionGroup("",exceptions=exceptionList))
+		exceptionList = []
+		resultList = []
+		
+		for c in self.__completions:
+			exception = c.exception()
+			if exception is not None:
+				exceptionList.append(exception)
 			else:
-				self._setResult(tuple(resultList))
+				resultList.append(c.result())
+		
+		if len(exceptionList) == 1:
+			self._setException(exceptionList[0])
+		elif len(exceptionList) != 0:
+			self._setException(ExceptionGroup("",exceptionList))
+		else:
+			self._setResult(tuple(resultList))
 
 #class Lock(Delayer):
 #	"""
@@ -539,13 +662,13 @@ class Gather(Generic[*T],CompletionFuture[Tuple[*T]]):
 #	"""
 #	__locked : bool
 #	__inUnlockLoop : bool
-#	__queue : List[Callable[[]]]
+#	__queue : Deque[Callable[[]]]
 #
 #	def __new__(cls) -> Self:
 #		self = super().__new__(cls)
 #		self.__locked = False
 #		self.__inUnlockLoop = False
-#		self.__queue = []
+#		self.__queue = collections.deque()
 #		return self
 #	
 #	def then(self, proc: Callable[[Self], Any]):
@@ -574,7 +697,7 @@ class Gather(Generic[*T],CompletionFuture[Tuple[*T]]):
 #			exceptions = []
 #			try:
 #				while not self.__locked and len(self.__queue) != 0:
-#					t = self.__queue.pop(0)
+#					t = self.__queue.popleft()
 #					try:
 #						t(self)
 #					except BaseException as exc:
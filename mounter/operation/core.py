@@ -1,6 +1,8 @@
 
 import asyncio
+import collections
 import concurrent.futures
+import os
 import subprocess
 import functools
 import concurrent
@@ -23,14 +25,18 @@ class AsyncOps(Module):
 		super().__init__(context)
 		self.__runner = asyncio.Runner()
 		self.__runnerDelayer = None
-		self.__maxParallelCommands = None
+		# Commands are mostly compilers, which are bound by the processor.
+		# Running more of them than there are cores only adds contention.
+		self.__maxParallelCommands = os.cpu_count() or 1
+		self.__sequential = False
 		self.__commandCount = 0
 		self.__commandQueue = QueueDelayer()
-		self.__laterQueue : List[Completion] | None = None
+		self.__laterQueue : Deque[Completion] | None = None
 		self.__currentRedLight = None
 		self.__threadPool = concurrent.futures.ThreadPoolExecutor()
 	
 	def disableAsync(self):
+		self.__sequential = True
 		self.__maxParallelCommands = 1
 	
 	def run(self):
@@ -68,8 +74,11 @@ class AsyncOps(Module):
 		return task.result()
 
 	def __drainLaterQueue(self):
-		while len(self.__laterQueue) != 0:
-			x = self.__laterQueue.pop(0)
+		# Tasks may be appended while draining. Each one is released
+		# as soon as it is taken from the queue.
+		queue = self.__laterQueue
+		while len(queue) != 0:
+			x = queue.popleft()
 			if not x.done():
 				self.__runLoopUntil(x)
 		self.__laterQueue = None
@@ -79,7 +88,7 @@ class AsyncOps(Module):
 		Schedules the awaitable to be completed after all modules are loaded.
 		"""
 		if self.__laterQueue is None:
-			self.__laterQueue = [Task(task)]
+			self.__laterQueue = collections.deque([Task(task)])
 			self.ws.append(self.__drainLaterQueue)
 		else:
 			self.__laterQueue.append(Task(task))
@@ -91,7 +100,7 @@ class AsyncOps(Module):
 		It is recommended to wait on this before the first time an operation
 		runs heavy computation, but only after dependent operations have been dispatched.
 		"""
-		if self.__maxParallelCommands == 1:
+		if self.__sequential:
 			return Completed()
 		
 		# It is best if the red lights are bunched together.
@@ -99,10 +108,12 @@ class AsyncOps(Module):
 		# start as soon as possible, preferrably sooner than any task
 		# on the pooled threads, which slow down everything due to GIL.
 		
-		if self.__currentRedLight is None or self.__currentRedLight.done():
-			self.__currentRedLight = AsyncCompletion(self.__getLoop())
+		redLight = self.__currentRedLight
+		if redLight is None or redLight.done():
+			redLight = AsyncCompletion(self.__getLoop())
+			self.__currentRedLight = redLight
 
-		return self.__currentRedLight
+		return redLight
 	
 	async def runCommand(self, command, input = bytes(), *, progressUnit = None) -> Tuple[int, bytes, bytes]:
 		"""
@@ -130,9 +141,10 @@ class AsyncOps(Module):
 		
 		return (rc, stdout, stderr)
 	
-	def callInBackground(self, command : Callable[[],A]) -> CompletionFuture[A]:
+	def callInBackground(self, command : Callable[[*T],A], *args : *T) -> CompletionFuture[A]:
 		"""
 		Submits the specified callable to be executed on a background (Python) thread asynchronously.
+		The callable receives the specified arguments.
 		
 		A CompletionFuture is returned representing the future result of the call.
 		"""
@@ -143,10 +155,7 @@ class AsyncOps(Module):
 		# is immediately halted when a new thread is created.
 		# Therefore it is best if we delay submission using our async loop first.
 
-		def doSubmit():
-			self.__threadPool.submit(functools.partial(unsafeCompletable.callAndSetResult,command))
-		
-		self.__getLoop().call_soon(doSubmit)
+		self.__getLoop().call_soon(self.__threadPool.submit,unsafeCompletable.callAndSetResult,command,*args)
 
 		return safeCompletable
 
@@ -1,6 +1,5 @@
 
 from typing import Set, Dict
-from functools import partial
 from mounter.operation.core import *
 from mounter.path import Path
 from mounter.persistence import Persistence, persistenceTypeId
@@ -44,16 +43,30 @@ class FileManagement(Module):
 	def __doCopy(sourcePath : Path, targetPath : Path):
 		sourcePath.opCopyTo(targetPath)
 	
+	def __doLink(sourcePath : Path, targetPath : Path):
+		sourcePath.opLinkTo(targetPath)
+	
 	@op
 	async def copyFile(self, sourcePath : Path, targetPath : Path):
+		return await self.__transferFile(sourcePath, targetPath, "Copy", FileManagement.__doCopy)
+	
+	@op
+	async def linkFile(self, sourcePath : Path, targetPath : Path):
+		"""
+		Same as copyFile, but hardlinks the file where possible.
+		The target must not be modified, as that would modify the source too.
+		"""
+		return await self.__transferFile(sourcePath, targetPath, "Link", FileManagement.__doLink)
+	
+	async def __transferFile(self, sourcePath : Path, targetPath : Path, verb : str, transfer):
 		with self.ws[Progress].register() as pu:
-			pu.setName(f"Copy {sourcePath} to {targetPath}")
+			pu.setName(f"{verb} {sourcePath} to {targetPath}")
 			sourceHash = await self.ws[FileDeltaChecker].query(sourcePath)
 			data = self.lock(targetPath,self)
 			if sourceHash != data.get("sourceHash",None) \
 			or not targetPath.isPresent():
 				pu.setRunning()
-				await self.ws[AsyncOps].callInBackground(partial(FileManagement.__doCopy,sourcePath,targetPath))
+				await self.ws[AsyncOps].callInBackground(transfer,sourcePath,targetPath)
 				data["sourceHash"] = sourceHash
 			else:
 				pu.setUpToDate()
@@ -22,6 +22,16 @@ class Path(Hashable):
 			self.__s = None
 		return self
 	
+	@classmethod
+	def __fromResolved(cls,path : pathlib.Path) -> Self:
+		"""
+		Wraps a pathlib path that is known to be absolute and resolved already.
+		"""
+		self = super().__new__(cls)
+		self.__p = path
+		self.__s = None
+		return self
+	
 	def __hash__(self):
 		return self.__p.__hash__()
 	
@@ -47,8 +57,7 @@ class Path(Hashable):
 		return f"Path(\'{str(self)}\')"
 	
 	def hasExtension(self,*ext):
-		e = self.getExtension()
-		return any(x == e for x in ext)
+		return self.getExtension() in ext
 	
 	def resolve(self,subpath):
 		return Path(self.__p.joinpath(subpath))
@@ -128,6 +137,24 @@ class Path(Hashable):
 	def opCopyTo(self,other : 'Path'):
 		shutil.copy(src=str(self),dst=str(other))
 	
+	def opLinkTo(self,other : 'Path'):
+		"""
+		Hardlinks this file to the other path, replacing it if present.
+		Falls back to copying where the file system does not allow the link.
+		"""
+		if other.isFile():
+			other.opDeleteFile()
+		try:
+			os.link(self.__p,other.__p)
+		except OSError:
+			self.opCopyTo(other)
+	
+	def opReplace(self,other : 'Path'):
+		"""
+		Moves this file to the other path, atomically replacing it if present.
+		"""
+		os.replace(self.__p,other.__p)
+	
 	def isDirectory(self):
 		return self.__p.is_dir()
 	
@@ -151,21 +178,42 @@ class Path(Hashable):
 		"""
 		A generator producing the direct children of this Path.
 		"""
+		return [f for (f,_) in self.__scanChildren(deterministic)]
+	
+	def __scanChildren(self,deterministic):
+		"""
+		Lists the direct children of this directory along with their directory entries.
+		The entries know their own type, so walks need not stat each child again.
+		Since this path is resolved, only links among the children need resolving.
+		"""
+		with os.scandir(self.__p) as entries:
+			children = [(Path(e.path) if e.is_symlink() or e.is_junction() else Path.__fromResolved(pathlib.Path(e.path)),e) for e in entries]
 		if deterministic:
-			return sorted(Path(p) for p in self.__p.iterdir())
-		else:
-			return (Path(p) for p in self.__p.iterdir())
+			children.sort(key = lambda c: str(c[0]))
+		return children
 	
 	def getLeaves(self,deterministic = False):
 		"""
 		A generator producing all non-directory subpaths of this path.
 		"""
-		for f in self.getChildren(deterministic = deterministic):
-			if f.isFile():
+		for (f,e) in self.__scanChildren(deterministic):
+			if e.is_file():
 				yield f
-			if f.isDirectory():
+			elif e.is_dir():
 				yield from f.getLeaves(deterministic = deterministic)
 	
+	def __descendantsPreorder(self,deterministic):
+		for (f,e) in self.__scanChildren(deterministic):
+			yield f
+			if e.is_dir():
+				yield from f.__descendantsPreorder(deterministic)
+	
+	def __descendantsPostorder(self,deterministic):
+		for (f,e) in self.__scanChildren(deterministic):
+			if e.is_dir():
+				yield from f.__descendantsPostorder(deterministic)
+			yield f
+	
 	def getPreorder(self,includeSelf = True,deterministic = False):
 		"""
 		A generator producing all subpaths of this path in preorder.
@@ -174,8 +222,7 @@ class Path(Hashable):
 		if includeSelf:
 			yield self
 		if self.isDirectory():
-			for f in self.getChildren(deterministic = deterministic):
-				yield from f.getPreorder(includeSelf = True,deterministic = deterministic)
+			yield from self.__descendantsPreorder(deterministic)
 	
 	def getPostorder(self,includeSelf = True,deterministic = False):
 		"""
@@ -183,8 +230,7 @@ class Path(Hashable):
 		All paths are encountered after all their subpaths.
 		"""
 		if self.isDirectory():
-			for f in self.getChildren(deterministic = deterministic):
-				yield from f.getPostorder(includeSelf = True,deterministic = deterministic)
+			yield from self.__descendantsPostorder(deterministic)
 		if includeSelf:
 			yield self
 	
@@ -1,7 +1,7 @@
 
 import shutil
 import itertools
-from typing import List
+from typing import Callable, List
 from mounter.operation.completion import isInterrupt
 from mounter.workspace import *
 from mounter.workspace import Workspace
@@ -30,11 +30,17 @@ class ProgressUnit():
 		self.__name = None
 		self._pid = None
 	
-	def setName(self, name : str):
+	def setName(self, name : str | Callable[[],str]):
+		"""
+		Sets the name of the unit. If a callable is specified,
+		it is only called once the name is actually needed.
+		"""
 		self.__name = name
 		self.__r(self,NAME_SET)
 	
 	def getName(self):
+		if callable(self.__name):
+			self.__name = self.__name()
 		return self.__name
 	
 	def setRunning(self):